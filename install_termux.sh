@@ -22,7 +22,7 @@ echo "[4/10] Installing python-dotenv..."
 pip install python-dotenv
 
 echo "[5/10] Installing httpx..."
-pip install httpx
+pip install "httpx[http2]"
 
 echo "[6/10] Installing aiofiles..."
 pip install aiofiles
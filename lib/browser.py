@@ -1,23 +1,145 @@
 """Browser manager for Playwright automation with stealth features (2026)"""
 import asyncio
+import os
 import platform
-from typing import Optional
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from playwright.async_api import async_playwright, Browser, BrowserContext, Error as PlaywrightError, Page, Playwright, Route
 from fake_useragent import UserAgent
 from loguru import logger
 
 from .models import BrowserConfig
 
 
+# fake_useragent parses its bundled DB on construction - share one instance
+_UA_SINGLETON: Optional[UserAgent] = None
+
+
+def _get_ua() -> UserAgent:
+    """Get the shared UserAgent instance, creating it on first use"""
+    global _UA_SINGLETON
+    if _UA_SINGLETON is None:
+        _UA_SINGLETON = UserAgent()
+    return _UA_SINGLETON
+
+
+# JavaScript patches to hide automation (minified once at import)
+_STEALTH_SRC = """
+// Override the navigator.webdriver property
+Object.defineProperty(navigator, 'webdriver', {
+    get: () => undefined
+});
+
+// Mock plugins
+Object.defineProperty(navigator, 'plugins', {
+    get: () => [1, 2, 3, 4, 5]
+});
+
+// Mock languages
+Object.defineProperty(navigator, 'languages', {
+    get: () => ['en-US', 'en']
+});
+
+// Chrome runtime
+window.chrome = {
+    runtime: {}
+};
+
+// Permissions
+const originalQuery = window.navigator.permissions.query;
+window.navigator.permissions.query = (parameters) => (
+    parameters.name === 'notifications' ?
+        Promise.resolve({ state: Notification.permission }) :
+        originalQuery(parameters)
+);
+
+// Remove Playwright-specific properties
+for (const k of [
+    '__playwright', '__pw_manual', '__fxdriver_evaluated', '__webdriver_evaluate',
+    '__selenium_evaluate', '__fxdriver_unwrapped', '__driver_unwrapped',
+    '__webdriver_unwrapped', '__selenium_unwrapped', '__driver_evaluate',
+    '__webdriver_script_fn'
+]) {
+    delete navigator[k];
+}
+"""
+
+_JS_LINE_COMMENT_RE = re.compile(r'^\s*//.*$', re.MULTILINE)
+_JS_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _minify(js: str) -> str:
+    """Strip full-line comments and collapse whitespace runs"""
+    return _JS_WHITESPACE_RE.sub(' ', _JS_LINE_COMMENT_RE.sub('', js)).strip()
+
+
+_STEALTH_JS = _minify(_STEALTH_SRC)
+
+
+# Tracking/ad hosts aborted before they can delay page load
+_BLOCK = ('doubleclick', 'google-analytics', 'googletagmanager', 'hotjar', 'segment.io', 'fullstory')
+_BLOCK_RE = re.compile('|'.join(re.escape(host) for host in _BLOCK))
+
+
+async def _abort_route(route: Route) -> None:
+    """Abort a request matched by _BLOCK_RE"""
+    await route.abort()
+
+
 class BrowserManager:
     """Manages Playwright browser instances with anti-detection features"""
     
-    def __init__(self, config: BrowserConfig):
+    # Origins whose web storage is wiped between identities in a persistent profile
+    _RESET_ORIGINS = ('https://www.roblox.com', 'https://auth.roblox.com', 'https://apis.roblox.com')
+    _RESET_STORAGE_TYPES = 'local_storage,indexeddb,cache_storage,service_workers'
+    
+    # Desktop launch args - GPU stays enabled so pages rasterize in hardware
+    BASE_LAUNCH_ARGS = (
+        '--disable-blink-features=AutomationControlled',
+        '--disable-features=IsolateOrigins,site-per-process',
+        '--no-sandbox',
+        '--disable-setuid-sandbox',
+        '--window-size=1920,1080',
+        '--lang=en-US,en',
+    )
+    
+    # Extra args needed on Termux/Android
+    ANDROID_EXTRA_ARGS = (
+        '--single-process',
+        '--no-zygote',
+        '--disable-gpu',
+        '--disable-dev-shm-usage',
+    )
+    
+    # Static context options; only the user agent varies per context
+    _BASE_CTX = {
+        'viewport': {'width': 1920, 'height': 1080},
+        'locale': 'en-US',
+        'timezone_id': 'America/New_York',
+        'permissions': ['geolocation', 'notifications'],
+        'color_scheme': 'dark',
+        'extra_http_headers': {
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-User': '?1',
+            'Sec-Fetch-Dest': 'document',
+            'Upgrade-Insecure-Requests': '1',
+        }
+    }
+    
+    def __init__(self, config: BrowserConfig, extension_path: Optional[str] = None):
         self.config = config
+        self.extension_path = extension_path
         self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
-        self.ua = UserAgent()
+        self.context_options: Optional[dict] = None
+        self._loaded_extension: Optional[str] = None
+        self.ua = _get_ua()
         
     async def __aenter__(self):
         """Async context manager entry"""
@@ -28,161 +150,187 @@ class BrowserManager:
         """Async context manager exit"""
         await self.close()
     
-    async def initialize(self) -> None:
-        """Initialize Playwright and browser"""
+    async def initialize(self, default_context: bool = True) -> None:
+        """
+        Initialize Playwright and browser
+        
+        Args:
+            default_context: Create self.context at launch. Callers that only
+                use new_context() can skip it (persistent profiles always get one)
+        """
         logger.info("Initializing Playwright browser...")
         
         self.playwright = await async_playwright().start()
+        await self._launch(self.extension_path, default_context)
         
+        logger.success("Browser initialized successfully")
+    
+    async def _launch(self, extension_path: Optional[str], default_context: bool = True) -> None:
+        """Launch the browser (optionally with an extension) and create a context"""
         # Launch options
-        launch_args = [
-            '--disable-blink-features=AutomationControlled',
-            '--disable-features=IsolateOrigins,site-per-process',
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-accelerated-2d-canvas',
-            '--disable-gpu',
-            '--window-size=1920,1080',
-            '--lang=en-US,en',
-        ]
+        launch_args = list(self.BASE_LAUNCH_ARGS)
         
         # For Termux/Android compatibility
-        if platform.system() == 'Linux' and 'ANDROID_ROOT' in platform.os.environ:
-            launch_args.extend([
-                '--single-process',
-                '--no-zygote',
-            ])
+        if platform.system() == 'Linux' and 'ANDROID_ROOT' in os.environ:
+            launch_args.extend(self.ANDROID_EXTRA_ARGS)
             logger.info("Detected Termux/Android environment - using compatible launch args")
         
-        self.browser = await self.playwright.chromium.launch(
-            headless=self.config.headless,
-            args=launch_args
-        )
+        # Load the extension at launch so it stays loaded for the browser's lifetime
+        headless = self.config.headless
+        if extension_path:
+            if headless:
+                logger.warning("Extensions require non-headless mode. Switching to headless=False")
+                headless = False
+            launch_args.extend([
+                f'--disable-extensions-except={extension_path}',
+                f'--load-extension={extension_path}',
+            ])
         
-        # Create context with stealth settings
-        context_options = await self._get_context_options()
-        self.context = await self.browser.new_context(**context_options)
+        if self.context_options is None:
+            self.context_options = self._get_context_options()
         
-        # Apply stealth patches
-        if self.config.stealth_mode:
-            await self._apply_stealth_scripts(self.context)
+        if self.config.profile_dir:
+            # Persistent profile keeps extension storage (e.g. NopeCHA key) across runs
+            self.browser = None
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir=self.config.profile_dir,
+                headless=headless,
+                args=launch_args,
+                **self.context_options
+            )
+        else:
+            self.browser = await self.playwright.chromium.launch(
+                headless=headless,
+                args=launch_args
+            )
+            if not default_context:
+                self.context = None
+                self._loaded_extension = extension_path
+                return
+            
+            # Create context with stealth settings
+            self.context = await self.browser.new_context(**self.context_options)
         
-        logger.success("Browser initialized successfully")
+        self._loaded_extension = extension_path
+        await self._prepare_context(self.context)
     
-    async def _get_context_options(self) -> dict:
+    def _get_context_options(self) -> dict:
         """Get browser context options with anti-detection"""
         user_agent = self.ua.random if self.config.user_agent == "auto" else self.config.user_agent
         
-        return {
-            'viewport': {'width': 1920, 'height': 1080},
-            'user_agent': user_agent,
-            'locale': 'en-US',
-            'timezone_id': 'America/New_York',
-            'permissions': ['geolocation', 'notifications'],
-            'color_scheme': 'dark',
-            'extra_http_headers': {
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-User': '?1',
-                'Sec-Fetch-Dest': 'document',
-            }
-        }
+        return {**self._BASE_CTX, 'user_agent': user_agent}
+    
+    async def _prepare_context(self, context: BrowserContext) -> None:
+        """Apply stealth patches and tracker blocking to a new context"""
+        if self.config.stealth_mode:
+            await self._apply_stealth_scripts(context)
+        
+        # Opt-in: Playwright disables the HTTP cache for any context with routes,
+        # so Roblox's static assets would be refetched on every page of the flow
+        if self.config.block_trackers:
+            # Only URLs matching the pattern are routed to Python; the rest never leave the browser
+            await context.route(_BLOCK_RE, _abort_route)
     
     async def _apply_stealth_scripts(self, context: BrowserContext) -> None:
         """Apply JavaScript patches to hide automation"""
-        stealth_js = """
-        // Override the navigator.webdriver property
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined
-        });
-        
-        // Mock plugins
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5]
-        });
-        
-        // Mock languages
-        Object.defineProperty(navigator, 'languages', {
-            get: () => ['en-US', 'en']
-        });
-        
-        // Chrome runtime
-        window.chrome = {
-            runtime: {}
-        };
-        
-        // Permissions
-        const originalQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (parameters) => (
-            parameters.name === 'notifications' ?
-                Promise.resolve({ state: Notification.permission }) :
-                originalQuery(parameters)
-        );
-        
-        // Remove Playwright-specific properties
-        delete navigator.__playwright;
-        delete navigator.__pw_manual;
-        delete navigator.__fxdriver_evaluated;
-        delete navigator.__webdriver_evaluate;
-        delete navigator.__selenium_evaluate;
-        delete navigator.__fxdriver_unwrapped;
-        delete navigator.__driver_unwrapped;
-        delete navigator.__webdriver_unwrapped;
-        delete navigator.__selenium_unwrapped;
-        delete navigator.__driver_evaluate;
-        delete navigator.__webdriver_script_fn;
-        """
-        
-        await context.add_init_script(stealth_js)
+        await context.add_init_script(_STEALTH_JS)
         logger.debug("Applied stealth JavaScript patches")
     
-    async def new_page(self) -> Page:
-        """Create a new page in the current context"""
-        if not self.context:
+    async def new_page(self, context: Optional[BrowserContext] = None) -> Page:
+        """Create a new page in the given context, or the current one"""
+        context = context or self.context
+        if not context:
             raise RuntimeError("Browser context not initialized. Call initialize() first.")
         
-        page = await self.context.new_page()
-        
-        # Additional page-level stealth
-        await page.set_extra_http_headers({
-            'Upgrade-Insecure-Requests': '1',
-        })
-        
-        return page
+        return await context.new_page()
     
     async def install_extension(self, extension_path: str) -> None:
         """Install a browser extension (e.g., NopeCHA)"""
-        if self.context:
-            # Close existing context
+        # Extensions stay loaded for the browser's lifetime
+        if extension_path == self._loaded_extension:
+            logger.debug(f"Extension already installed from {extension_path}")
+            return
+        
+        # Extensions can only be loaded at launch, so relaunch with it.
+        # Closing the browser tears down its contexts as well.
+        default_context = self.context is not None
+        if self.browser:
+            await self.browser.close()
+        elif self.context:
             await self.context.close()
         
-        # Recreate context with extension
-        context_options = await self._get_context_options()
+        await self._launch(extension_path, default_context)
         
-        # Extensions only work in non-headless mode
-        if self.config.headless:
-            logger.warning("Extensions require non-headless mode. Switching to headless=False")
-            await self.browser.close()
-            
-            self.browser = await self.playwright.chromium.launch(
-                headless=False,
-                args=[
-                    f'--disable-extensions-except={extension_path}',
-                    f'--load-extension={extension_path}',
-                    '--disable-blink-features=AutomationControlled',
-                ]
-            )
+        logger.info(f"Installed extension from {extension_path}")
+    
+    async def snapshot(self) -> dict:
+        """Capture the current context's cookies and local storage"""
+        if not self.context:
+            raise RuntimeError("Browser context not initialized. Call initialize() first.")
         
-        self.context = await self.browser.new_context(**context_options)
+        return await self.context.storage_state()
+    
+    async def swap_identity(self, state: Optional[dict] = None) -> None:
+        """
+        Replace the current context with a fresh identity without relaunching
         
-        if self.config.stealth_mode:
-            await self._apply_stealth_scripts(self.context)
+        Args:
+            state: Optional storage state from snapshot() to restore
+        """
+        if not self.context:
+            raise RuntimeError("Browser context not initialized. Call initialize() first.")
         
-        logger.info(f"Installed extension from {extension_path}")
+        if not self.browser:
+            # Persistent profiles have a single context; reset it in place instead
+            await self._reset_persistent_context()
+            if state:
+                await self.context.add_cookies(state.get('cookies', []))
+            logger.debug("Reset cookies, storage and pages in persistent context")
+            return
+        
+        await self.context.close()
+        self.context = await self.new_context(state)
+        
+        logger.debug("Swapped browser identity")
+    
+    async def _reset_persistent_context(self) -> None:
+        """Close the previous identity's pages and clear its cookies and Roblox storage"""
+        # Open the replacement tab first so the persistent window never has zero pages;
+        # closing the old tabs also drops their sessionStorage
+        old_pages = list(self.context.pages)
+        blank = await self.context.new_page()
+        for page in old_pages:
+            await page.close()
+        
+        await self.context.clear_cookies()
+        
+        # Extension storage (the NopeCHA key) lives under its own origin and is kept
+        try:
+            cdp = await self.context.new_cdp_session(blank)
+            for origin in self._RESET_ORIGINS:
+                await cdp.send('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': self._RESET_STORAGE_TYPES,
+                })
+            await cdp.detach()
+        except PlaywrightError as e:
+            logger.warning(f"Could not clear site storage in persistent profile: {e}")
+    
+    async def new_context(self, state: Optional[dict] = None) -> BrowserContext:
+        """
+        Create an additional stealth context on the running browser
+        
+        Args:
+            state: Optional storage state from snapshot() to restore
+        """
+        if not self.browser:
+            raise RuntimeError("No shared browser to create contexts on (persistent profile or not initialized)")
+        
+        self.context_options = self._get_context_options()
+        context = await self.browser.new_context(storage_state=state, **self.context_options)
+        await self._prepare_context(context)
+        
+        return context
     
     async def close(self) -> None:
         """Close browser and cleanup"""
@@ -201,6 +349,63 @@ class BrowserManager:
         logger.info("Browser manager closed successfully")
 
 
+class BrowserPool:
+    """
+    Hands out up to `size` concurrent contexts on one shared browser
+    
+    With a persistent profile there is only one context, so it is lent to
+    one borrower at a time with its cookies reset in between.
+    """
+    
+    def __init__(self, config: BrowserConfig, size: int, extension_path: Optional[str] = None):
+        if config.profile_dir and size > 1:
+            logger.warning("browser.profile_dir has a single context; pool size limited to 1")
+            size = 1
+        self._sem = asyncio.Semaphore(size)
+        self._lock = asyncio.Lock()
+        self._manager = BrowserManager(config, extension_path=extension_path)
+        self._started = False
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
+    
+    async def _ensure_browser(self) -> None:
+        """Launch the shared browser on first use"""
+        async with self._lock:
+            if not self._started:
+                # Borrowers get their own contexts; no unused default one
+                await self._manager.initialize(default_context=False)
+                self._started = True
+    
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[BrowserContext]:
+        """Borrow a fresh context, closing it when the block exits"""
+        async with self._sem:
+            await self._ensure_browser()
+            
+            if not self._manager.browser:
+                await self._manager.swap_identity()
+                yield self._manager.context
+                return
+            
+            context = await self._manager.new_context()
+            try:
+                yield context
+            finally:
+                await context.close()
+    
+    async def close(self) -> None:
+        """Close the shared browser"""
+        if self._started:
+            await self._manager.close()
+            self._started = False
+
+
 async def test_browser():
     """Test browser manager"""
     config = BrowserConfig(headless=False, stealth_mode=True)
@@ -1,56 +1,131 @@
 """NopeCHA captcha solver with configurable delays for improved accuracy (2026)"""
 import asyncio
+import hashlib
+import os
+import time
 from typing import Optional
-from playwright.async_api import Page, Frame
+from playwright.async_api import Page, Error as PlaywrightError, TimeoutError as PWTimeout
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 
 from .models import CaptchaConfig
 
 
+# FunCaptcha (Arkose Labs) selectors and probes, built once at import
+_ARKOSE_IFRAME_CSS = 'iframe[src*="arkose"], #arkose-iframe'
+_HAS_CAPTCHA_JS = f"() => !!document.querySelector('{_ARKOSE_IFRAME_CSS}')"
+_CAPTCHA_GONE_JS = f"() => !document.querySelector('{_ARKOSE_IFRAME_CSS}')"
+# After submitting signup either the challenge is attached or Roblox redirects home
+_CHALLENGE_OR_HOME_JS = (
+    f"() => !!document.querySelector('{_ARKOSE_IFRAME_CSS}') || location.pathname.startsWith('/home')"
+)
+_DETECT_CAPTCHA_JS = """() => {
+    const f = [...document.querySelectorAll('iframe')].find(
+        i => /arkose/i.test(i.src || '') || i.id === 'arkose-iframe'
+    );
+    return f ? {url: f.src, id: f.id} : null;
+}"""
+
+# The extension's setup.js replaces the page body with an "Imported ..." summary
+_SETUP_IMPORTED_JS = "() => [...document.querySelectorAll('h2')].some(h => h.innerText.startsWith('Imported'))"
+
+
 class NopeCHASolver:
     """NopeCHA captcha solver with accuracy-focused delays"""
     
-    def __init__(self, config: CaptchaConfig):
+    # Sentinel written into the browser profile once the API key is stored
+    SENTINEL_NAME = ".nopecha_configured"
+    SENTINEL_MAX_AGE = 30 * 24 * 3600
+    
+    def __init__(self, config: CaptchaConfig, profile_dir: Optional[str] = None):
         self.config = config
+        self.profile_dir = profile_dir
         self.extension_configured = False
     
+    def _sentinel_path(self) -> Optional[str]:
+        """Get the configured-sentinel path inside the persistent profile"""
+        if not self.profile_dir:
+            return None
+        return os.path.join(self.profile_dir, self.SENTINEL_NAME)
+    
+    def _is_configured_in_profile(self, api_key: str) -> bool:
+        """Check whether the persistent profile already holds this API key"""
+        sentinel = self._sentinel_path()
+        if not sentinel or not os.path.exists(sentinel):
+            return False
+        
+        if time.time() - os.path.getmtime(sentinel) >= self.SENTINEL_MAX_AGE:
+            return False
+        
+        with open(sentinel, 'r', encoding='utf-8') as f:
+            return f.read().strip() == hashlib.sha256(api_key.encode()).hexdigest()
+    
     async def configure_extension(self, page: Page, api_key: str) -> None:
         """Configure NopeCHA extension with API key"""
+        if self._is_configured_in_profile(api_key):
+            self.extension_configured = True
+            logger.info("NopeCHA already configured in browser profile")
+            return
+        
         try:
             logger.info(f"Configuring NopeCHA with API key...")
-            await page.goto(f"https://nopecha.com/setup#{api_key}")
-            await asyncio.sleep(2)
+            await page.goto(f"https://nopecha.com/setup#{api_key}", wait_until="domcontentloaded")
+            
+            # Wait for the extension's setup script to render the imported settings
+            try:
+                await page.wait_for_function(_SETUP_IMPORTED_JS, timeout=5000)
+                confirmed = True
+            except PWTimeout:
+                logger.debug("NopeCHA setup page did not confirm import, falling back to fixed wait")
+                await asyncio.sleep(2)
+                confirmed = False
             self.extension_configured = True
-            logger.success("NopeCHA configured successfully")
-        except Exception as e:
+            
+            # Only a confirmed import may skip setup on later runs
+            sentinel = self._sentinel_path()
+            if sentinel and confirmed:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                with open(sentinel, 'w', encoding='utf-8') as f:
+                    f.write(hashlib.sha256(api_key.encode()).hexdigest())
+            
+            if confirmed:
+                logger.success("NopeCHA configured successfully")
+            else:
+                logger.warning("NopeCHA setup not confirmed; it will be retried on the next page")
+        except (PWTimeout, PlaywrightError) as e:
             logger.error(f"Failed to configure NopeCHA: {e}")
             raise
     
-    async def detect_captcha(self, page: Page, timeout: int = 5) -> Optional[Frame]:
-        """Detect if captcha is present on page"""
+    async def detect_captcha(self, page: Page) -> Optional[dict]:
+        """
+        Detect if captcha is present on page
+        
+        Uses a single JS-side probe and returns the iframe descriptor ({url, id})
+        """
         try:
-            # Check for FunCaptcha (Arkose Labs) iframe
-            captcha_frame = page.frame(url=lambda url: "arkose" in url.lower())
-            if captcha_frame:
-                logger.warning("FunCaptcha detected")
-                return captcha_frame
-            
-            # Check for specific iframe ID
-            captcha_frame = page.frame_locator('xpath=//*[@id="arkose-iframe"]')
-            if await captcha_frame.locator('body').count() > 0:
-                logger.warning("FunCaptcha iframe detected")
-                return captcha_frame
+            # Find FunCaptcha (Arkose Labs) iframe by src or ID in one round-trip
+            info = await page.evaluate(_DETECT_CAPTCHA_JS)
+            if not info:
+                return None
             
-            return None
-        except Exception as e:
+            logger.warning("FunCaptcha detected")
+            return info
+        except PWTimeout as e:
             logger.debug(f"No captcha detected: {e}")
             return None
     
+    async def wait_for_challenge(self, page: Page, timeout: int = 10) -> None:
+        """Wait for the signup response: a captcha frame or the home redirect"""
+        try:
+            await page.wait_for_function(_CHALLENGE_OR_HOME_JS, timeout=timeout * 1000)
+        except PWTimeout:
+            # Neither showed up; give the page a moment before probing anyway
+            await asyncio.sleep(0.5)
+    
     @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        reraise=True
+        stop=stop_after_attempt(4),
+        wait=wait_exponential_jitter(initial=2, max=8, jitter=2),
+        retry_error_callback=lambda retry_state: False
     )
     async def solve_captcha(self, page: Page) -> bool:
         """
@@ -64,35 +139,45 @@ class NopeCHASolver:
             return False
         
         try:
+            # Snapshot URL so a redirect away from the signup page counts as success
+            start_url = page.url
+            
+            # Skip the pre-solve delay entirely when no captcha iframe exists
+            if not await page.evaluate(_HAS_CAPTCHA_JS):
+                logger.info("No captcha detected")
+                return True
+            
             # Wait before solving (let page fully load)
             logger.info(f"Waiting {self.config.delays['before_solve']}s before solving...")
             await asyncio.sleep(self.config.delays['before_solve'])
             
             # Detect captcha
-            captcha_frame = await self.detect_captcha(page)
-            if not captcha_frame:
+            captcha_info = await self.detect_captcha(page)
+            if not captcha_info:
                 logger.info("No captcha detected")
                 return True
             
             logger.info("Captcha detected - waiting for NopeCHA to solve...")
             
-            # Wait for NopeCHA to solve (max timeout)
-            start_time = asyncio.get_event_loop().time()
-            solved = False
+            # Race "captcha iframe gone" against "URL changed" (max timeout)
+            timeout_ms = self.config.timeout * 1000
+            captcha_gone = asyncio.create_task(page.wait_for_function(
+                _CAPTCHA_GONE_JS,
+                timeout=timeout_ms
+            ))
+            url_changed = asyncio.create_task(page.wait_for_url(
+                lambda url: "/home" in url or url != start_url,
+                timeout=timeout_ms
+            ))
             
-            while (asyncio.get_event_loop().time() - start_time) < self.config.timeout:
-                # Check if captcha is gone
-                current_captcha = await self.detect_captcha(page, timeout=2)
-                if not current_captcha:
-                    solved = True
-                    break
-                
-                # Check if URL changed (successful submission)
-                if "/home" in page.url or page.url != page.url:
-                    solved = True
-                    break
-                
-                await asyncio.sleep(2)
+            done, pending = await asyncio.wait(
+                {captcha_gone, url_changed},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            
+            solved = any(task.exception() is None for task in done)
             
             if not solved:
                 logger.error("Captcha solving timed out")
@@ -108,9 +193,9 @@ class NopeCHASolver:
         except Exception as e:
             logger.error(f"Error solving captcha: {e}")
             
+            # Let tenacity handle the backoff between attempts
             if self.config.auto_retry_on_fail:
-                logger.info(f"Retrying in {self.config.delays['between_retries']}s...")
-                await asyncio.sleep(self.config.delays['between_retries'])
+                raise
             
             return False
     
@@ -129,13 +214,20 @@ class NopeCHASolver:
         retries = max_retries or self.config.max_retries
         
         for attempt in range(retries):
+            # Start watching for the captcha iframe before the action runs
+            probe = asyncio.create_task(page.wait_for_selector(
+                _ARKOSE_IFRAME_CSS,
+                timeout=5000,
+                state='attached'
+            ))
+            
             try:
                 # Perform the action
                 await action_func()
                 
                 # Check for captcha
-                await asyncio.sleep(2)
-                captcha = await self.detect_captcha(page)
+                done, _ = await asyncio.wait({probe}, timeout=0.5)
+                captcha = bool(done) and probe.exception() is None and probe.result() is not None
                 
                 if captcha:
                     logger.warning(f"Captcha appeared after action (attempt {attempt + 1}/{retries})")
@@ -158,6 +250,8 @@ class NopeCHASolver:
                 if attempt < retries - 1:
                     await asyncio.sleep(self.config.delays['between_retries'])
                 continue
+            finally:
+                probe.cancel()
         
         logger.error(f"Failed after {retries} attempts")
         return False
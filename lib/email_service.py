@@ -1,20 +1,86 @@
 """Free email service providers for account verification (2026)"""
 import asyncio
-import re
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Optional, List, Tuple
 from datetime import datetime
 import httpx
-from pymailtm import MailTm, Account
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import retry, stop_after_attempt, stop_after_delay, wait_exponential
 
+from . import json_compat as _json
+from .json_compat import JSON_HEADERS as _JSON_HEADERS
 from .models import EmailConfig
+from .username_gen import UsernameGenerator
+
+# Shared generator for mailbox names
+_username_gen = UsernameGenerator()
+
+# Roblox verification link: fixed prefix, ticket runs until whitespace or a closing quote/paren
+_VERIFY_LINK_PREFIX = "https://www.roblox.com/account/settings/verify-email?ticket="
+_VERIFY_LINK_TERMS = frozenset(" \t\n\r\f\v)\"'")
+
+
+def _extract_verify_link(text: str, truncated: bool = False) -> Optional[str]:
+    """
+    Find the verification link with a literal search instead of a regex
+    
+    Args:
+        text: Message body, or a preview snippet
+        truncated: The text may be cut short (list previews); only accept a
+            ticket that ends at a terminator before the end of the text
+    """
+    start = text.find(_VERIFY_LINK_PREFIX)
+    if start < 0:
+        return None
+    
+    ticket_start = end = start + len(_VERIFY_LINK_PREFIX)
+    while end < len(text) and text[end] not in _VERIFY_LINK_TERMS:
+        end += 1
+    
+    # A preview cut mid-ticket either runs to the end or ends in an ellipsis
+    if truncated and (end == len(text) or text[end - 1] == "…" or text.endswith("...", 0, end)):
+        return None
+    return text[start:end] if end > ticket_start else None
 
 
 class EmailProvider(ABC):
     """Abstract base class for email providers"""
     
+    SEEN_CACHE_SIZE = 256
+    
+    def __init__(self):
+        # One pooled client per provider so inbox polls reuse connections
+        self._client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            http2=True
+        )
+        # (mailbox, msg_id) -> verification link (or None) for messages already parsed;
+        # keyed by mailbox too since one provider serves every account in a run
+        self._seen: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+    
+    def _remember(self, key: Tuple[str, str], link: Optional[str]) -> Optional[str]:
+        """Record a message's parse result so later polls skip re-fetching it"""
+        self._seen[key] = link
+        if len(self._seen) > self.SEEN_CACHE_SIZE:
+            self._seen.popitem(last=False)
+        return link
+    
+    async def aclose(self) -> None:
+        """Close the provider's HTTP client"""
+        await self._client.aclose()
+    
+    @staticmethod
+    def _is_candidate(message) -> bool:
+        """Cheap check on list metadata before fetching the full message"""
+        subject = (message.get("subject") or message.get("mail_subject") or "").lower()
+        sender = message.get("from") or message.get("mail_from") or ""
+        if isinstance(sender, dict):
+            sender = sender.get("address", "")
+        return "roblox" in sender.lower() or "verif" in subject
+    
     @abstractmethod
     async def create_account(self, password: str) -> Tuple[str, str, str]:
         """
@@ -31,48 +97,95 @@ class EmailProvider(ABC):
         pass
     
     @abstractmethod
-    async def extract_verification_link(self, message) -> Optional[str]:
-        """Extract Roblox verification link from email"""
+    async def extract_verification_link(self, message, mailbox: str) -> Optional[str]:
+        """Extract Roblox verification link from an email sent to mailbox"""
         pass
 
 
 class MailTmProvider(EmailProvider):
     """Mail.tm provider (FREE)"""
     
+    # Domain list rarely changes; shared by all instances for an hour
+    DOMAINS_TTL = 3600
+    _domains_cache: List[str] = []
+    _domains_cache_ts: float = 0
+    
     def __init__(self):
-        self.mailtm = MailTm()
+        super().__init__()
+        self._token: Optional[str] = None
+        self._token_expires: float = 0
+        self._token_address: Optional[str] = None
+    
+    async def _get_token(self, email: str, password: str) -> str:
+        """Get a bearer token for the account, reusing the cached one until it expires"""
+        if self._token and self._token_address == email and time.monotonic() < self._token_expires:
+            return self._token
+        
+        token_response = await self._client.post(
+            "https://api.mail.tm/token",
+            content=_json.dumps({"address": email, "password": password}),
+            headers=_JSON_HEADERS,
+            timeout=10
+        )
+        
+        if token_response.status_code != 200:
+            raise Exception(f"Failed to get Mail.tm token: {token_response.text}")
+        
+        # Mail.tm JWTs live ~10 minutes; refresh a little early
+        self._token = _json.loads(token_response.content).get("token")
+        self._token_address = email
+        self._token_expires = time.monotonic() + 540
+        return self._token
+    
+    async def _get_domains(self) -> List[str]:
+        """Get available Mail.tm domains, cached across accounts"""
+        cls = type(self)
+        if cls._domains_cache and time.monotonic() - cls._domains_cache_ts < self.DOMAINS_TTL:
+            return cls._domains_cache
+        
+        response = await self._client.get("https://api.mail.tm/domains", timeout=10)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get Mail.tm domains: {response.text}")
+        
+        members = _json.loads(response.content).get("hydra:member", [])
+        cls._domains_cache = [d["domain"] for d in members if d.get("isActive", True)]
+        cls._domains_cache_ts = time.monotonic()
+        return cls._domains_cache
+    
+    def _invalidate_token(self) -> None:
+        """Drop the cached token so the next request re-authenticates"""
+        self._token = None
+        self._token_expires = 0
     
     async def create_account(self, password: str) -> Tuple[str, str, str]:
         """Create Mail.tm account"""
         try:
             # Get available domains
-            domains = self.mailtm._get_domains_list()
+            domains = await self._get_domains()
             if not domains:
                 raise Exception("No Mail.tm domains available")
             
             # Generate random username
-            from .lib import Main
-            lib = Main()
-            username = lib.generateUsername(scrambled=True).lower()
+            username = _username_gen.generate().lower()
             address = f"{username}@{domains[0]}"
             
             # Create account via API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.mail.tm/accounts",
-                    json={"address": address, "password": password},
-                    timeout=10
-                )
-                
-                if response.status_code != 201:
-                    raise Exception(f"Failed to create Mail.tm account: {response.text}")
-                
-                data = response.json()
-                account_id = data.get("id")
-                
-                logger.success(f"Created Mail.tm account: {address}")
-                return address, password, account_id
-                
+            response = await self._client.post(
+                "https://api.mail.tm/accounts",
+                content=_json.dumps({"address": address, "password": password}),
+                headers=_JSON_HEADERS,
+                timeout=10
+            )
+            
+            if response.status_code != 201:
+                raise Exception(f"Failed to create Mail.tm account: {response.text}")
+            
+            data = _json.loads(response.content)
+            account_id = data.get("id")
+            
+            logger.success(f"Created Mail.tm account: {address}")
+            return address, password, account_id
+            
         except Exception as e:
             logger.error(f"Mail.tm account creation failed: {e}")
             raise
@@ -80,67 +193,63 @@ class MailTmProvider(EmailProvider):
     async def get_messages(self, account_id: str, email: str, password: str) -> List:
         """Get messages from Mail.tm inbox"""
         try:
-            # Get auth token
-            async with httpx.AsyncClient() as client:
-                token_response = await client.post(
-                    "https://api.mail.tm/token",
-                    json={"address": email, "password": password},
-                    timeout=10
-                )
-                
-                if token_response.status_code != 200:
-                    raise Exception(f"Failed to get Mail.tm token: {token_response.text}")
-                
-                token = token_response.json().get("token")
-                
-                # Get messages
-                messages_response = await client.get(
+            # Get messages (re-authenticate once if the cached token was rejected)
+            for _ in range(2):
+                token = await self._get_token(email, password)
+                messages_response = await self._client.get(
                     "https://api.mail.tm/messages",
                     headers={"Authorization": f"Bearer {token}"},
                     timeout=10
                 )
-                
-                if messages_response.status_code != 200:
-                    return []
-                
-                messages = messages_response.json().get("hydra:member", [])
-                return messages
-                
+                if messages_response.status_code != 401:
+                    break
+                self._invalidate_token()
+            
+            if messages_response.status_code != 200:
+                return []
+            
+            messages = _json.loads(messages_response.content).get("hydra:member", [])
+            return messages
+            
         except Exception as e:
             logger.debug(f"Error fetching Mail.tm messages: {e}")
             return []
     
-    async def extract_verification_link(self, message) -> Optional[str]:
+    async def extract_verification_link(self, message, mailbox: str) -> Optional[str]:
         """Extract verification link from Mail.tm message"""
+        if not self._is_candidate(message):
+            return None
+        
+        msg_id = message.get("id")
+        key = (mailbox, msg_id)
+        if key in self._seen:
+            return self._seen[key]
+        
+        # The list payload's preview is truncated; use it only if it holds a whole link
+        link = _extract_verify_link(message.get("intro") or "", truncated=True)
+        if link:
+            return link
+        
         try:
-            # Get message ID
-            msg_id = message.get("id")
-            
-            # Fetch full message
-            async with httpx.AsyncClient() as client:
-                # Get token (simplified - should cache this)
-                response = await client.get(
-                    f"https://api.mail.tm/messages/{msg_id}",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    return None
-                
-                data = response.json()
-                text = data.get("text", "") or data.get("html", [""])[0] if "html" in data else ""
-                
-                # Extract Roblox verification link
-                match = re.search(
-                    r'https://www\.roblox\.com/account/settings/verify-email\?ticket=[^\s)"]+',
-                    text
-                )
-                
-                if match:
-                    return match.group(0)
-                
+            # Fetch full message with the token cached by get_messages()
+            if not self._token:
                 return None
-                
+            
+            response = await self._client.get(
+                f"https://api.mail.tm/messages/{msg_id}",
+                headers={"Authorization": f"Bearer {self._token}"},
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                return None
+            
+            data = _json.loads(response.content)
+            text = data.get("text", "") or data.get("html", [""])[0] if "html" in data else ""
+            
+            # Extract Roblox verification link
+            return self._remember(key, _extract_verify_link(text))
+            
         except Exception as e:
             logger.error(f"Error extracting verification link: {e}")
             return None
@@ -152,23 +261,22 @@ class TempMailProvider(EmailProvider):
     async def create_account(self, password: str) -> Tuple[str, str, str]:
         """Create Temp-Mail account"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Get random email
-                response = await client.get(
-                    "https://www.1secmail.com/api/v1/?action=genRandomMailbox&count=1",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Failed to create Temp-Mail account: {response.text}")
-                
-                email = response.json()[0]
-                # Parse email for API calls
-                login, domain = email.split("@")
-                
-                logger.success(f"Created Temp-Mail account: {email}")
-                return email, password, f"{login}@{domain}"
-                
+            # Get random email
+            response = await self._client.get(
+                "https://www.1secmail.com/api/v1/?action=genRandomMailbox&count=1",
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"Failed to create Temp-Mail account: {response.text}")
+            
+            email = _json.loads(response.content)[0]
+            # Parse email for API calls
+            login, domain = email.split("@")
+            
+            logger.success(f"Created Temp-Mail account: {email}")
+            return email, password, f"{login}@{domain}"
+            
         except Exception as e:
             logger.error(f"Temp-Mail account creation failed: {e}")
             raise
@@ -178,52 +286,49 @@ class TempMailProvider(EmailProvider):
         try:
             login, domain = email.split("@")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://www.1secmail.com/api/v1/?action=getMessages&login={login}&domain={domain}",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    return []
-                
-                messages = response.json()
-                return messages
-                
+            response = await self._client.get(
+                f"https://www.1secmail.com/api/v1/?action=getMessages&login={login}&domain={domain}",
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                return []
+            
+            messages = _json.loads(response.content)
+            return messages
+            
         except Exception as e:
             logger.debug(f"Error fetching Temp-Mail messages: {e}")
             return []
     
-    async def extract_verification_link(self, message) -> Optional[str]:
+    async def extract_verification_link(self, message, mailbox: str) -> Optional[str]:
         """Extract verification link from Temp-Mail message"""
+        if not self._is_candidate(message):
+            return None
+        
+        msg_id = message.get("id")
+        key = (mailbox, msg_id)
+        if key in self._seen:
+            return self._seen[key]
+        
         try:
-            msg_id = message.get("id")
             email = message.get("to")
             login, domain = email.split("@")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://www.1secmail.com/api/v1/?action=readMessage&login={login}&domain={domain}&id={msg_id}",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    return None
-                
-                data = response.json()
-                text = data.get("textBody", "") or data.get("htmlBody", "")
-                
-                # Extract verification link
-                match = re.search(
-                    r'https://www\.roblox\.com/account/settings/verify-email\?ticket=[^\s)"]+',
-                    text
-                )
-                
-                if match:
-                    return match.group(0)
-                
+            response = await self._client.get(
+                f"https://www.1secmail.com/api/v1/?action=readMessage&login={login}&domain={domain}&id={msg_id}",
+                timeout=10
+            )
+            
+            if response.status_code != 200:
                 return None
-                
+            
+            data = _json.loads(response.content)
+            text = data.get("textBody", "") or data.get("htmlBody", "")
+            
+            # Extract verification link
+            return self._remember(key, _extract_verify_link(text))
+            
         except Exception as e:
             logger.error(f"Error extracting verification link: {e}")
             return None
@@ -233,31 +338,31 @@ class GuerrillaMailProvider(EmailProvider):
     """Guerrilla Mail provider (FREE)"""
     
     def __init__(self):
+        super().__init__()
         self.session_id = None
         self.email = None
     
     async def create_account(self, password: str) -> Tuple[str, str, str]:
         """Create Guerrilla Mail account"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    "https://api.guerrillamail.com/ajax.php?f=get_email_address",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Failed to create Guerrilla Mail account: {response.text}")
-                
-                data = response.json()
-                email = data.get("email_addr")
-                sid_token = data.get("sid_token")
-                
-                self.session_id = sid_token
-                self.email = email
-                
-                logger.success(f"Created Guerrilla Mail account: {email}")
-                return email, password, sid_token
-                
+            response = await self._client.get(
+                "https://api.guerrillamail.com/ajax.php?f=get_email_address",
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"Failed to create Guerrilla Mail account: {response.text}")
+            
+            data = _json.loads(response.content)
+            email = data.get("email_addr")
+            sid_token = data.get("sid_token")
+            
+            self.session_id = sid_token
+            self.email = email
+            
+            logger.success(f"Created Guerrilla Mail account: {email}")
+            return email, password, sid_token
+            
         except Exception as e:
             logger.error(f"Guerrilla Mail account creation failed: {e}")
             raise
@@ -265,51 +370,52 @@ class GuerrillaMailProvider(EmailProvider):
     async def get_messages(self, account_id: str, email: str, password: str) -> List:
         """Get messages from Guerrilla Mail inbox"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://api.guerrillamail.com/ajax.php?f=get_email_list&sid_token={account_id}",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    return []
-                
-                data = response.json()
-                messages = data.get("list", [])
-                return messages
-                
+            response = await self._client.get(
+                f"https://api.guerrillamail.com/ajax.php?f=get_email_list&sid_token={account_id}",
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                return []
+            
+            data = _json.loads(response.content)
+            messages = data.get("list", [])
+            return messages
+            
         except Exception as e:
             logger.debug(f"Error fetching Guerrilla Mail messages: {e}")
             return []
     
-    async def extract_verification_link(self, message) -> Optional[str]:
+    async def extract_verification_link(self, message, mailbox: str) -> Optional[str]:
         """Extract verification link from Guerrilla Mail message"""
+        if not self._is_candidate(message):
+            return None
+        
+        mail_id = message.get("mail_id")
+        key = (mailbox, mail_id)
+        if key in self._seen:
+            return self._seen[key]
+        
+        # The list payload's excerpt is truncated; use it only if it holds a whole link
+        link = _extract_verify_link(message.get("mail_excerpt") or "", truncated=True)
+        if link:
+            return link
+        
         try:
-            mail_id = message.get("mail_id")
+            response = await self._client.get(
+                f"https://api.guerrillamail.com/ajax.php?f=fetch_email&email_id={mail_id}&sid_token={self.session_id}",
+                timeout=10
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://api.guerrillamail.com/ajax.php?f=fetch_email&email_id={mail_id}&sid_token={self.session_id}",
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    return None
-                
-                data = response.json()
-                text = data.get("mail_body", "")
-                
-                # Extract verification link
-                match = re.search(
-                    r'https://www\.roblox\.com/account/settings/verify-email\?ticket=[^\s)"]+',
-                    text
-                )
-                
-                if match:
-                    return match.group(0)
-                
+            if response.status_code != 200:
                 return None
-                
+            
+            data = _json.loads(response.content)
+            text = data.get("mail_body", "")
+            
+            # Extract verification link
+            return self._remember(key, _extract_verify_link(text))
+            
         except Exception as e:
             logger.error(f"Error extracting verification link: {e}")
             return None
@@ -329,12 +435,35 @@ class EmailService:
         self.email: Optional[str] = None
         self.password: Optional[str] = None
         self.account_id: Optional[str] = None
+        
+        # Poll quickly at first and back off toward check_interval; built here
+        # so the bounds can come from the config
+        self.wait_for_verification_email = retry(
+            stop=stop_after_delay(config.verification_timeout * 2) | stop_after_attempt(30),
+            wait=wait_exponential(multiplier=1, min=0.5, max=config.check_interval)
+        )(self.wait_for_verification_email)
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close all provider HTTP clients"""
+        for provider in self.providers.values():
+            await provider.aclose()
     
     async def create_email(self, password: str) -> Tuple[str, str, str]:
         """Create email with automatic fallback"""
         # Try primary service
         services = [self.config.primary_service] + self.config.fallback_services
         
+        if self.config.parallel_fallback:
+            return await self._create_email_racing(password, services)
+        
         for service_name in services:
             try:
                 provider = self.providers.get(service_name)
@@ -359,7 +488,44 @@ class EmailService:
         
         raise Exception("All email services failed")
     
-    @retry(stop=stop_after_attempt(30), wait=wait_fixed(5))
+    async def _create_email_racing(self, password: str, services: List[str]) -> Tuple[str, str, str]:
+        """Try all providers at once and keep the first account created"""
+        tasks = {}
+        for service_name in services:
+            provider = self.providers.get(service_name)
+            if not provider:
+                logger.warning(f"Unknown email service: {service_name}")
+                continue
+            tasks[asyncio.create_task(provider.create_account(password))] = service_name
+        
+        logger.info(f"Trying {', '.join(tasks.values())} concurrently...")
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    service_name = tasks[task]
+                    if task.exception():
+                        logger.warning(f"{service_name} failed: {task.exception()}")
+                        continue
+                    
+                    email, pwd, account_id = task.result()
+                    
+                    self.current_provider = self.providers[service_name]
+                    self.email = email
+                    self.password = pwd
+                    self.account_id = account_id
+                    
+                    logger.success(f"Email created with {service_name}: {email}")
+                    return email, pwd, account_id
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        raise Exception("All email services failed")
+    
     async def wait_for_verification_email(self) -> Optional[str]:
         """Wait for verification email and extract link"""
         if not self.current_provider or not self.email:
@@ -377,12 +543,25 @@ class EmailService:
                 logger.debug("No messages yet, waiting...")
                 raise Exception("No messages")  # Trigger retry
             
-            # Check each message for verification link
-            for message in messages:
-                link = await self.current_provider.extract_verification_link(message)
-                if link:
-                    logger.success(f"Found verification link: {link}")
-                    return link
+            # Check all messages concurrently, stopping at the first link found
+            tasks = [
+                asyncio.create_task(self.current_provider.extract_verification_link(message, self.email))
+                for message in messages
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    try:
+                        link = await next_done
+                    except Exception as e:
+                        logger.debug(f"Error checking message: {e}")
+                        continue
+                    
+                    if isinstance(link, str):
+                        logger.success(f"Found verification link: {link}")
+                        return link
+            finally:
+                for task in tasks:
+                    task.cancel()
             
             logger.debug("Messages found but no verification link")
             raise Exception("No verification link")  # Trigger retry
@@ -399,11 +578,11 @@ async def test_email_service():
         fallback_services=["tempmail", "guerrillamail"]
     )
     
-    service = EmailService(config)
-    email, pwd, account_id = await service.create_email("TestPassword123")
-    
-    logger.info(f"Email created: {email}")
-    logger.info(f"Account ID: {account_id}")
+    async with EmailService(config) as service:
+        email, pwd, account_id = await service.create_email("TestPassword123")
+        
+        logger.info(f"Email created: {email}")
+        logger.info(f"Account ID: {account_id}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+"""JSON encoding shared by the API clients and exporters (2026)"""
+try:
+    import orjson as _impl
+except ImportError:  # optional speedup; stdlib json reads and writes the same payloads
+    import json as _impl
+
+
+JSON_HEADERS = {"content-type": "application/json"}
+
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    return _impl.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    result = _impl.dumps(obj)
+    return result if isinstance(result, bytes) else result.encode("utf-8")
+
+
+def dumps_line(obj) -> bytes:
+    """Serialize one JSON Lines record, stringifying unknown types"""
+    result = _impl.dumps(obj, default=str)
+    if isinstance(result, str):
+        result = result.encode("utf-8")
+    return result + b"\n"
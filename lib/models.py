@@ -1,5 +1,5 @@
 """Data models for Roblox auto-signup script (2026)"""
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional, List, Dict
 from datetime import datetime
 
@@ -15,13 +15,24 @@ class Account:
     created_at: datetime = field(default_factory=datetime.now)
     verified: bool = False
     customized: bool = False
+    _cookie_index: Optional[Dict[str, str]] = field(default=None, repr=False, compare=False)
+    
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # Reassigning cookies invalidates the name -> value index
+        if name == "cookies":
+            super().__setattr__("_cookie_index", None)
+    
+    def _index(self) -> Dict[str, str]:
+        """Build the cookie name -> value index on first use"""
+        if self._cookie_index is None:
+            # Reversed so the first cookie with a given name wins
+            self._cookie_index = {c.get("name"): c.get("value") for c in reversed(self.cookies)}
+        return self._cookie_index
     
     def get_roblosecurity(self) -> Optional[str]:
         """Extract .ROBLOSECURITY cookie value"""
-        for cookie in self.cookies:
-            if cookie.get("name") == ".ROBLOSECURITY":
-                return cookie.get("value")
-        return None
+        return self._index().get(".ROBLOSECURITY")
     
     def to_dict(self) -> dict:
         """Convert to dictionary for JSON export"""
@@ -60,6 +71,7 @@ class EmailConfig:
     verification_timeout: int = 60
     max_retries: int = 5
     check_interval: int = 5
+    parallel_fallback: bool = False
 
 
 @dataclass
@@ -76,6 +88,8 @@ class BrowserConfig:
     headless: bool = False
     stealth_mode: bool = True
     user_agent: str = "auto"
+    profile_dir: str = ""
+    block_trackers: bool = False
 
 
 @dataclass
@@ -96,7 +110,7 @@ class Config:
     following_usernames: List[str] = field(default_factory=list)
     
     # Export settings
-    export_formats: List[str] = field(default_factory=lambda: ["txt", "json", "csv"])
+    export_formats: List[str] = field(default_factory=lambda: ["txt", "jsonl", "csv"])
     roblox_account_manager: bool = True
     
     # Advanced settings
@@ -111,52 +125,48 @@ class Config:
     proxy: ProxyConfig = field(default_factory=ProxyConfig)
     browser: BrowserConfig = field(default_factory=BrowserConfig)
     
+    # YAML (section, key) -> Config field for the flat top-level settings
+    _YAML_FIELDS = {
+        ('account', 'password'): 'password',
+        ('account', 'count'): 'count',
+        ('account', 'verification_enabled'): 'verification_enabled',
+        ('account', 'customization_enabled'): 'customization_enabled',
+        ('username', 'format'): 'username_format',
+        ('username', 'scrambled'): 'username_scrambled',
+        ('following', 'enabled'): 'following_enabled',
+        ('following', 'usernames'): 'following_usernames',
+        ('export', 'formats'): 'export_formats',
+        ('export', 'roblox_account_manager'): 'roblox_account_manager',
+        ('advanced', 'analytics'): 'analytics',
+        ('advanced', 'parallel_execution'): 'parallel_execution',
+        ('advanced', 'max_parallel'): 'max_parallel',
+        ('advanced', 'rate_limit_delay'): 'rate_limit_delay',
+    }
+    
     @classmethod
     def from_yaml(cls, yaml_path: str) -> 'Config':
         """Load configuration from YAML file"""
         import yaml
         
         with open(yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+            data = yaml.safe_load(f) or {}
+        
+        kwargs = {}
+        for (section, key), name in cls._YAML_FIELDS.items():
+            values = data.get(section) or {}
+            if key in values:
+                kwargs[name] = values[key]
         
         return cls(
-            password=data.get('account', {}).get('password', 'Qing762.chy'),
-            count=data.get('account', {}).get('count', 1),
-            verification_enabled=data.get('account', {}).get('verification_enabled', True),
-            customization_enabled=data.get('account', {}).get('customization_enabled', True),
-            username_format=data.get('username', {}).get('format', ''),
-            username_scrambled=data.get('username', {}).get('scrambled', True),
-            following_enabled=data.get('following', {}).get('enabled', False),
-            following_usernames=data.get('following', {}).get('usernames', []),
-            export_formats=data.get('export', {}).get('formats', ['txt', 'json', 'csv']),
-            roblox_account_manager=data.get('export', {}).get('roblox_account_manager', True),
-            analytics=data.get('advanced', {}).get('analytics', True),
-            parallel_execution=data.get('advanced', {}).get('parallel_execution', False),
-            max_parallel=data.get('advanced', {}).get('max_parallel', 3),
-            rate_limit_delay=data.get('advanced', {}).get('rate_limit_delay', 5),
-            captcha=CaptchaConfig(
-                service=data.get('captcha', {}).get('service', 'nopecha'),
-                api_key=data.get('captcha', {}).get('api_key', ''),
-                delays=data.get('captcha', {}).get('delays', {}),
-                timeout=data.get('captcha', {}).get('timeout', 300),
-                max_retries=data.get('captcha', {}).get('max_retries', 5),
-                auto_retry_on_fail=data.get('captcha', {}).get('auto_retry_on_fail', True)
-            ),
-            email=EmailConfig(
-                primary_service=data.get('email', {}).get('primary_service', 'mailtm'),
-                fallback_services=data.get('email', {}).get('fallback_services', []),
-                verification_timeout=data.get('email', {}).get('verification_timeout', 60),
-                max_retries=data.get('email', {}).get('max_retries', 5),
-                check_interval=data.get('email', {}).get('check_interval', 5)
-            ),
-            proxy=ProxyConfig(
-                enabled=data.get('proxy', {}).get('enabled', False),
-                rotation=data.get('proxy', {}).get('rotation', True),
-                list=data.get('proxy', {}).get('list', [])
-            ),
-            browser=BrowserConfig(
-                headless=data.get('browser', {}).get('headless', False),
-                stealth_mode=data.get('browser', {}).get('stealth_mode', True),
-                user_agent=data.get('browser', {}).get('user_agent', 'auto')
-            )
+            captcha=_from_section(CaptchaConfig, data.get('captcha')),
+            email=_from_section(EmailConfig, data.get('email')),
+            proxy=_from_section(ProxyConfig, data.get('proxy')),
+            browser=_from_section(BrowserConfig, data.get('browser')),
+            **kwargs
         )
+
+
+def _from_section(section_cls, values: Optional[dict]):
+    """Build a config dataclass from a YAML section, keeping defaults for missing keys"""
+    values = values or {}
+    return section_cls(**{f.name: values[f.name] for f in fields(section_cls) if f.name in values})
@@ -1,21 +1,54 @@
 """Roblox API interactions (2026)"""
 import asyncio
 import re
-from typing import Optional, List, Tuple
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 import httpx
 from playwright.async_api import Page
 from loguru import logger
 
+from . import json_compat as _json
 from .models import Account
 
 
 class RobloxAPI:
     """Handles all Roblox API interactions"""
     
+    # Concurrent username checks allowed before auth.roblox.com starts throttling
+    VALIDATE_CONCURRENCY = 8
+    
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=10)
+        self.client = httpx.AsyncClient(
+            timeout=10,
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            event_hooks={
+                "request": [self._inject_csrf],
+                "response": [self._refresh_csrf_on_403],
+            }
+        )
         self.csrf_token: Optional[str] = None
+        # None marks names the users endpoint did not return
+        self._user_id_cache: Dict[str, Optional[int]] = {}
+        self._validate_sem = asyncio.Semaphore(self.VALIDATE_CONCURRENCY)
+    
+    async def _inject_csrf(self, request: httpx.Request) -> None:
+        """Attach the cached CSRF token to Roblox POSTs"""
+        if request.method == "POST" and self.csrf_token and request.url.host.endswith("roblox.com"):
+            request.headers["x-csrf-token"] = self.csrf_token
+    
+    async def _refresh_csrf_on_403(self, response: httpx.Response) -> None:
+        """Pick up a new CSRF token when Roblox rejects the current one"""
+        token = response.headers.get("x-csrf-token")
+        if response.status_code == 403 and token:
+            self.csrf_token = token
+    
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        """POST, retrying once if the CSRF token was refreshed by a 403"""
+        response = await self.client.post(url, **kwargs)
+        if response.status_code == 403 and response.headers.get("x-csrf-token"):
+            response = await self.client.post(url, **kwargs)
+        return response
     
     async def get_csrf_token(self) -> str:
         """Get X-CSRF-TOKEN for API requests"""
@@ -24,9 +57,8 @@ class RobloxAPI:
                 "https://auth.roblox.com/v2/login",
                 headers={"User-Agent": "Mozilla/5.0"}
             )
-            token = response.headers.get("x-csrf-token")
-            self.csrf_token = token
-            return token
+            # The response hook has already stored the token from the 403
+            return response.headers.get("x-csrf-token") or self.csrf_token or ""
         except Exception as e:
             logger.error(f"Failed to get CSRF token: {e}")
             return ""
@@ -39,7 +71,7 @@ class RobloxAPI:
                 f"?request.username={username}&request.birthday=04%2F15%2F02&request.context=Signup"
             )
             
-            data = response.json()
+            data = _json.loads(response.content)
             is_valid = data.get("code") == 0
             
             if is_valid:
@@ -53,27 +85,32 @@ class RobloxAPI:
             logger.error(f"Error validating username: {e}")
             return False
     
+    async def validate_usernames(self, usernames: List[str]) -> List[bool]:
+        """Check many usernames concurrently; results are in input order"""
+        async def check(username: str) -> bool:
+            async with self._validate_sem:
+                return await self.validate_username(username)
+        
+        return await asyncio.gather(*(check(u) for u in usernames))
+    
     async def validate_password(self, username: str, password: str) -> Tuple[bool, str]:
         """Validate password complexity"""
         try:
-            if not self.csrf_token:
-                await self.get_csrf_token()
-            
+            # No token prefetch: _post retries once with the token from the 403
             data = {"username": username, "password": password}
             headers = {
                 "accept": "application/json",
                 "content-type": "application/json;charset=UTF-8",
-                "x-csrf-token": self.csrf_token,
                 "user-agent": "Mozilla/5.0"
             }
             
-            response = await self.client.post(
+            response = await self._post(
                 "https://auth.roblox.com/v2/passwords/validate",
-                json=data,
+                content=_json.dumps(data),
                 headers=headers
             )
             
-            result = response.json()
+            result = _json.loads(response.content)
             is_valid = result.get("code") == 0
             message = result.get("message", "") if not is_valid else "Password is valid"
             
@@ -83,27 +120,36 @@ class RobloxAPI:
             logger.error(f"Error validating password: {e}")
             return False, str(e)
     
+    async def get_user_ids(self, usernames: List[str]) -> Dict[str, int]:
+        """Get user IDs for many usernames in a single request, caching the results"""
+        missing = [u for u in usernames if u not in self._user_id_cache]
+        if missing:
+            try:
+                response = await self._post(
+                    "https://users.roblox.com/v1/usernames/users",
+                    content=_json.dumps({"usernames": missing}),
+                    headers=_json.JSON_HEADERS
+                )
+                
+                data = _json.loads(response.content)
+                for user in data.get("data", []):
+                    self._user_id_cache[user["requestedUsername"]] = user["id"]
+                    logger.debug(f"User ID for '{user['requestedUsername']}': {user['id']}")
+                
+                # Remember unknown names so later accounts don't look them up again
+                # (only on a real answer, not a throttled or failed request)
+                if response.status_code == 200:
+                    for username in missing:
+                        self._user_id_cache.setdefault(username, None)
+                    
+            except Exception as e:
+                logger.error(f"Error getting user IDs: {e}")
+        
+        return {u: self._user_id_cache[u] for u in usernames if self._user_id_cache.get(u) is not None}
+    
     async def get_user_id(self, username: str) -> Optional[int]:
         """Get user ID from username"""
-        try:
-            response = await self.client.post(
-                "https://users.roblox.com/v1/usernames/users",
-                json={"usernames": [username]}
-            )
-            
-            data = response.json()
-            users = data.get("data", [])
-            
-            if users:
-                user_id = users[0].get("id")
-                logger.debug(f"User ID for '{username}': {user_id}")
-                return user_id
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error getting user ID: {e}")
-            return None
+        return (await self.get_user_ids([username])).get(username)
     
     async def follow_user(self, page: Page, username: str) -> bool:
         """Follow a user via UI interaction"""
@@ -115,17 +161,20 @@ class RobloxAPI:
             
             url = f"https://www.roblox.com/users/{user_id}/profile"
             await page.goto(url, wait_until="networkidle")
-            await asyncio.sleep(2)
             
-            # Click dropdown menu
+            # Click dropdown menu as soon as it is visible
             try:
+                await page.wait_for_selector(
+                    'button[data-testid="user-profile-more-button"]',
+                    state="visible",
+                    timeout=5000
+                )
                 await page.click(
                     'button[data-testid="user-profile-more-button"]',
                     timeout=5000
                 )
-                await asyncio.sleep(0.5)
                 
-                # Click follow button
+                # Click follow button (click waits for the menu to render it)
                 await page.click(
                     '//button[@id="follow-button"]',
                     timeout=5000
@@ -142,62 +191,87 @@ class RobloxAPI:
             logger.error(f"Error following user '{username}': {e}")
             return False
     
+    async def get_avatar_inventory(self, roblosecurity: str) -> dict:
+        """Fetch the account's avatar inventory"""
+        response = await self.client.get(
+            "https://avatar.roblox.com/v1/avatar-inventory",
+            params={"sortOption": "recentAdded", "pageLimit": 50},
+            headers={"Cookie": f".ROBLOSECURITY={roblosecurity}"}
+        )
+        response.raise_for_status()
+        return _json.loads(response.content)
+    
     async def customize_avatar(self, page: Page) -> bool:
         """Randomize avatar appearance"""
         try:
             logger.info("Customizing avatar...")
             
-            # Navigate to avatar page
-            await page.goto("https://www.roblox.com/my/avatar", wait_until="networkidle")
-            await asyncio.sleep(2)
-            
-            # Listen for inventory API call
-            async with page.expect_response("**/avatar-inventory**") as response_info:
-                await page.wait_for_load_state("networkidle")
+            # Fetch inventory directly with the account's session cookie
+            cookies = await page.context.cookies("https://www.roblox.com")
+            roblosecurity = next((c["value"] for c in cookies if c["name"] == ".ROBLOSECURITY"), None)
+            if not roblosecurity:
+                logger.warning("No .ROBLOSECURITY cookie - cannot fetch avatar inventory")
+                return False
             
-            response = await response_info.value
-            inventory = await response.json()
+            inventory = await self.get_avatar_inventory(roblosecurity)
             
-            # Group items by type
-            items_by_type = {}
+            # Keep only item names and subtypes as parallel lists
+            names, types = [], []
             for item in inventory.get('avatarInventoryItems', []):
-                if 'itemCategory' in item and 'itemSubType' in item['itemCategory']:
-                    item_type = item["itemCategory"]["itemSubType"]
-                    if item_type not in items_by_type:
-                        items_by_type[item_type] = []
-                    items_by_type[item_type].append(item)
+                category = item.get("itemCategory")
+                if category and "itemSubType" in category:
+                    names.append(item.get("itemName"))
+                    types.append(category["itemSubType"])
+            
+            # Group indices by type
+            type_to_idxs = {}
+            for i, item_type in enumerate(types):
+                type_to_idxs.setdefault(item_type, []).append(i)
             
             # Select random item from each category
             import random
-            selected_items = []
-            for item_type, items in items_by_type.items():
-                if items:
-                    selected = random.choice(items)
-                    selected_items.append(selected)
-            
-            # Click on selected items
-            for item in selected_items[:5]:  # Limit to 5 items to avoid timeout
-                try:
-                    item_name = item.get("itemName", "")
-                    if item_name:
-                        # Find and click item by data attribute
-                        await page.click(f'a[data-item-name="{item_name}"]', timeout=3000)
-                        await asyncio.sleep(0.5)
-                except Exception as e:
-                    logger.debug(f"Could not equip item: {e}")
-                    continue
+            selected_names = [names[random.choice(idxs)] for idxs in type_to_idxs.values()]
+            
+            # Navigate to avatar page only to equip
+            await page.goto("https://www.roblox.com/my/avatar", wait_until="networkidle")
+            try:
+                await page.wait_for_selector('a[data-item-name]', state="attached", timeout=5000)
+            except Exception as e:
+                logger.debug(f"Avatar items did not render: {e}")
+            
+            # Click on selected items in one JS round-trip
+            item_names = [name for name in selected_names if name][:5]  # Limit to 5 items
+            try:
+                clicked = await page.eval_on_selector_all(
+                    'a[data-item-name]',
+                    """(links, names) => {
+                        const wanted = new Set(names);
+                        let clicked = 0;
+                        for (const link of links) {
+                            if (wanted.delete(link.dataset.itemName)) {
+                                link.click();
+                                clicked++;
+                            }
+                        }
+                        return clicked;
+                    }""",
+                    item_names
+                )
+                logger.debug(f"Equipped {clicked}/{len(item_names)} items")
+            except Exception as e:
+                logger.debug(f"Could not equip items: {e}")
             
             # Randomize body type
             try:
                 body_value = random.choice([i for i in range(0, 101, 5)])
-                await page.evaluate(f"""
+                await page.evaluate("""(value) => {
                     const slider = document.querySelector('input[aria-label="Body Type Scale"]');
-                    if (slider) {{
-                        slider.value = {body_value};
-                        slider.dispatchEvent(new Event('input', {{ bubbles: true }}));
-                        slider.dispatchEvent(new Event('change', {{ bubbles: true }}));
-                    }}
-                """)
+                    if (slider) {
+                        slider.value = value;
+                        slider.dispatchEvent(new Event('input', { bubbles: true }));
+                        slider.dispatchEvent(new Event('change', { bubbles: true }));
+                    }
+                }""", body_value)
                 await asyncio.sleep(1)
             except Exception as e:
                 logger.debug(f"Could not adjust body type: {e}")
@@ -1,10 +1,41 @@
 """Username generation utilities (2026)"""
 import random
 import os
-from typing import Optional
+from functools import lru_cache
+from array import array
+from typing import List, Optional, Tuple
 from pathlib import Path
 
 
+def _flatten_weights(buckets, bucket_weights):
+    """Expand weighted letter buckets into flat letters + per-letter weights"""
+    letters, weights = [], []
+    for bucket, weight in zip(buckets, bucket_weights):
+        for letter in bucket:
+            letters.append(letter)
+            weights.append(weight / len(bucket))
+    return tuple(letters), weights
+
+
+def _build_alias(weights):
+    """Build a Walker alias table (Vose's method) for O(1) weighted draws"""
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n / total for w in weights]
+    prob, alias = array('d', [1.0] * n), array('B', range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    
+    while small and large:
+        small_i, large_i = small.pop(), large.pop()
+        prob[small_i], alias[small_i] = scaled[small_i], large_i
+        scaled[large_i] -= 1.0 - scaled[small_i]
+        (small if scaled[large_i] < 1.0 else large).append(large_i)
+    
+    # Leftovers are 1.0 up to float error
+    return prob, alias
+
+
 class UsernameGenerator:
     """
     Pronounceable username generator
@@ -14,90 +45,115 @@ class UsernameGenerator:
     
     CONSONANTS = "bcdfghjklmnpqrstvwxyz"
     VOWELS = "aeiou"
+    # generate() works on ASCII codepoints, so membership is an int set probe
+    _CONS_SET_INT = frozenset(CONSONANTS.encode('ascii'))
     
     CONS_WEIGHTED = ("tn", "rshd", "lfcm", "gypwb", "vbjxq", "z")
     VOW_WEIGHTED = ("eao", "iu")
     DOUBLE_CONS = ("he", "re", "ti", "ti", "hi", "to", "ll", "tt", "nn", "pp", "th", "nd", "st", "qu")
     DOUBLE_VOW = ("ee", "oo", "ei", "ou", "ai", "ea", "an", "er", "in", "on", "at", "es", "en", "of", "ed", "or", "as")
     
+    # Bucket probabilities (percent) for CONS_WEIGHTED / VOW_WEIGHTED
+    CONS_BUCKET_WEIGHTS = (40, 25, 15, 10, 7, 3)
+    VOW_BUCKET_WEIGHTS = (70, 30)
+    
+    CONS_FLAT, _cons_w = _flatten_weights(CONS_WEIGHTED, CONS_BUCKET_WEIGHTS)
+    VOW_FLAT, _vow_w = _flatten_weights(VOW_WEIGHTED, VOW_BUCKET_WEIGHTS)
+    CONS_PROB, CONS_ALIAS = _build_alias(_cons_w)
+    VOW_PROB, VOW_ALIAS = _build_alias(_vow_w)
+    del _cons_w, _vow_w
+    
+    CONS_FLAT_B = tuple(map(str.encode, CONS_FLAT))
+    VOW_FLAT_B = tuple(map(str.encode, VOW_FLAT))
+    DOUBLE_CONS_B = tuple(map(str.encode, DOUBLE_CONS))
+    DOUBLE_VOW_B = tuple(map(str.encode, DOUBLE_VOW))
+    
     def __init__(self, min_length: int = 10, max_length: int = 15):
         self.min_length = min_length
         self.max_length = max_length
+        # Own RNG state per generator; bound methods skip the lookups per draw
+        self._r = random.Random()
+        self._randrange = self._r.randrange
+        self._choice = self._r.choice
+        self._random = self._r.random
     
     def generate(self) -> str:
         """Generate a random pronounceable username"""
-        username, is_double, num_length = "", False, 0
+        buf, is_double, num_length = bytearray(), False, 0
+        randrange = self._randrange
+        get_consonant, get_vowel = self._get_consonant, self._get_vowel
+        cons_set = self._CONS_SET_INT
         
-        is_consonant = random.randrange(10) > 0
-        length = random.randrange(self.min_length, self.max_length + 1)
+        is_consonant = randrange(10) > 0
+        length = randrange(self.min_length, self.max_length + 1)
         
-        if random.randrange(5) == 0:
-            num_length = random.randrange(3) + 1
+        if randrange(5) == 0:
+            num_length = randrange(3) + 1
             if length - num_length < 2:
                 num_length = 0
         
         letter_length = max(1, length - num_length)
+        limit = letter_length - 1
         
         for _ in range(letter_length):
-            if len(username) > 0:
-                if username[-1] in self.CONSONANTS:
-                    is_consonant = False
-                elif username[-1] in self.VOWELS:
-                    is_consonant = True
+            if buf:
+                # Every generated letter is either a consonant or a vowel
+                is_consonant = buf[-1] not in cons_set
             
             if not is_double:
-                if random.randrange(8) == 0 and len(username) < int(letter_length) - 1:
+                if randrange(8) == 0 and len(buf) < limit:
                     is_double = True
                 
                 if is_consonant:
-                    username += self._get_consonant(is_double)
+                    buf += get_consonant(is_double)
                 else:
-                    username += self._get_vowel(is_double)
+                    buf += get_vowel(is_double)
                 
                 is_consonant = not is_consonant
             else:
                 is_double = False
         
         # Capitalize first letter sometimes
-        if random.randrange(2) == 0:
-            username = username[:1].upper() + username[1:]
+        if randrange(2) == 0:
+            buf[0] -= 32  # ASCII lowercase -> uppercase
         
         # Add numbers
         if num_length > 0:
-            for _ in range(num_length):
-                username += str(random.randrange(10))
+            buf += bytes([48 + randrange(10) for _ in range(num_length)])
         
-        return username
+        return buf.decode('ascii')
+    
+    def generate_batch(self, n: int) -> List[str]:
+        """Generate n usernames at once"""
+        generate = self.generate
+        return [generate() for _ in range(n)]
     
-    def _get_consonant(self, is_double: bool) -> str:
-        """Get consonant with weighted probability"""
+    def _get_consonant(self, is_double: bool) -> bytes:
+        """Get consonant (ASCII bytes) with weighted probability"""
         if is_double:
-            return random.choice(self.DOUBLE_CONS)
+            return self._choice(self.DOUBLE_CONS_B)
         
-        i = random.randrange(100)
-        if i < 40:
-            weight = 0
-        elif 40 <= i < 65:
-            weight = 1
-        elif 65 <= i < 80:
-            weight = 2
-        elif 80 <= i < 90:
-            weight = 3
-        elif 90 <= i < 97:
-            weight = 4
-        else:
-            return self.CONS_WEIGHTED[5]
-        
-        return self.CONS_WEIGHTED[weight][random.randrange(len(self.CONS_WEIGHTED[weight]))]
+        i = self._randrange(len(self.CONS_FLAT_B))
+        return self.CONS_FLAT_B[i if self._random() < self.CONS_PROB[i] else self.CONS_ALIAS[i]]
     
-    def _get_vowel(self, is_double: bool) -> str:
-        """Get vowel with weighted probability"""
+    def _get_vowel(self, is_double: bool) -> bytes:
+        """Get vowel (ASCII bytes) with weighted probability"""
         if is_double:
-            return random.choice(self.DOUBLE_VOW)
+            return self._choice(self.DOUBLE_VOW_B)
         
-        i = random.randrange(100)
-        weight = 0 if i < 70 else 1
-        return self.VOW_WEIGHTED[weight][random.randrange(len(self.VOW_WEIGHTED[weight]))]
+        i = self._randrange(len(self.VOW_FLAT_B))
+        return self.VOW_FLAT_B[i if self._random() < self.VOW_PROB[i] else self.VOW_ALIAS[i]]
+
+
+@lru_cache(maxsize=8)
+def _load_words_cached(lib_path: str, filename: str) -> Tuple[str, ...]:
+    """Read a word list once per process; later generators share the tuple"""
+    try:
+        filepath = os.path.join(lib_path, filename)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return tuple(word for word in (line.strip() for line in f) if word)
+    except FileNotFoundError:
+        return ()
 
 
 class StructuredUsernameGenerator:
@@ -108,29 +164,33 @@ class StructuredUsernameGenerator:
         self.verbs = self._load_words("verbs.txt")
         self.nouns = self._load_words("nouns.txt")
         self.adjectives = self._load_words("adjectives.txt")
+        self._ready = bool(self.verbs and self.nouns and self.adjectives)
+        self._fallback = None if self._ready else UsernameGenerator()
+        self._r = random.Random()
+        self._pick = self._r.choice
     
-    def _load_words(self, filename: str) -> list:
+    def _load_words(self, filename: str) -> Tuple[str, ...]:
         """Load words from file"""
-        try:
-            filepath = os.path.join(self.lib_path, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                words = [line.strip() for line in f if line.strip()]
-            return words
-        except FileNotFoundError:
-            return []
+        return _load_words_cached(self.lib_path, filename)
     
     def generate(self) -> str:
         """Generate structured username (verb + noun + adjective + number)"""
-        if not all([self.verbs, self.nouns, self.adjectives]):
+        if not self._ready:
             # Fallback to scrambled if word lists not found
-            return UsernameGenerator().generate()
+            return self._fallback.generate()
         
-        verb = random.choice(self.verbs)
-        noun = random.choice(self.nouns)
-        adjective = random.choice(self.adjectives)
-        number = random.randint(10, 99)
+        pick = self._pick
+        verb = pick(self.verbs)
+        noun = pick(self.nouns)
+        adjective = pick(self.adjectives)
+        number = self._r.randint(10, 99)
         
         return f"{verb}{noun}{adjective}{number}"
+    
+    def generate_batch(self, n: int) -> List[str]:
+        """Generate n usernames at once"""
+        generate = self.generate
+        return [generate() for _ in range(n)]
 
 
 def get_resource_path(relative_path: str) -> str:
@@ -3,39 +3,79 @@ Roblox Auto-Signup Script (Modernized 2026)
 Playwright-based automation with free services only
 """
 import asyncio
+import contextlib
+import csv
+import json
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
+from urllib.parse import urlsplit
 from loguru import logger
-from tqdm.rich import tqdm
+from playwright.async_api import BrowserContext, TimeoutError as PWTimeout
+from tqdm import tqdm
 
+from lib.json_compat import dumps_line as _jsonl_line
 from lib.models import Config, Account
-from lib.browser import BrowserManager
+from lib.browser import BrowserManager, BrowserPool
 from lib.captcha import NopeCHASolver
 from lib.email_service import EmailService
 from lib.roblox_api import RobloxAPI
 from lib.username_gen import UsernameGenerator, StructuredUsernameGenerator, get_resource_path
 
+try:
+    import pyperclip
+except ImportError:  # clipboard export is skipped without it (e.g. headless Termux)
+    pyperclip = None
+
+
+# Roblox's endpoint for attaching an email to the signed-in account
+_ADD_EMAIL_HOST = "accountsettings.roblox.com"
+_ADD_EMAIL_PATH = "/v1/email"
+
+
+def _is_add_email_response(response) -> bool:
+    """Match the response to the add-email POST"""
+    url = urlsplit(response.url)
+    return response.request.method == "POST" and url.hostname == _ADD_EMAIL_HOST and url.path == _ADD_EMAIL_PATH
+
 
 # Configure logger
 logger.remove()  # Remove default handler
 logger.add(
-    sys.stderr,
+    lambda message: tqdm.write(message, end="", file=sys.stderr),  # Keeps the progress bar intact
     format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>",
-    level="INFO"
+    level="INFO",
+    colorize=sys.stderr.isatty()
 )
 
 
 class RobloxAccountCreator:
     """Main account creation orchestrator"""
     
+    # Flush accounts.jsonl after this many streamed accounts
+    JSONL_FLUSH_EVERY = 5
+    
     def __init__(self, config: Config):
         self.config = config
         self.browser_mgr: Optional[BrowserManager] = None
+        self.browser_pool: Optional[BrowserPool] = None
         self.captcha_solver: Optional[NopeCHASolver] = None
         self.email_service: Optional[EmailService] = None
         self.roblox_api: Optional[RobloxAPI] = None
         self.accounts = []
+        self._jsonl = None
+        
+        # Built once per run; the structured generator reads its word lists here
+        if config.username_scrambled:
+            self.username_gen = UsernameGenerator()
+        else:
+            self.username_gen = StructuredUsernameGenerator()
+    
+    @property
+    def _parallel(self) -> bool:
+        """Whether accounts are created concurrently"""
+        return self.config.parallel_execution and self.config.count > 1
     
     async def initialize(self) -> None:
         """Initialize all services"""
@@ -44,75 +84,94 @@ class RobloxAccountCreator:
         # Initialize Roblox API
         self.roblox_api = RobloxAPI()
         
-        # Initialize browser
-        self.browser_mgr = BrowserManager(self.config.browser)
-        await self.browser_mgr.initialize()
+        # Initialize browser (NopeCHA is loaded at launch if API key provided)
+        extension_path = get_resource_path("lib/NopeCHA") if self.config.captcha.api_key else None
+        if self._parallel:
+            # Each parallel signup borrows its own context (launched on first use)
+            self.browser_pool = BrowserPool(
+                self.config.browser, max(1, self.config.max_parallel), extension_path=extension_path
+            )
+        else:
+            self.browser_mgr = BrowserManager(self.config.browser, extension_path=extension_path)
+            await self.browser_mgr.initialize()
         
-        # Install NopeCHA if API key provided
-        if self.config.captcha.api_key:
-            extension_path = get_resource_path("lib/NopeCHA")
-            await self.browser_mgr.install_extension(extension_path)
-            self.captcha_solver = NopeCHASolver(self.config.captcha)
+        if extension_path:
+            self.captcha_solver = NopeCHASolver(self.config.captcha, profile_dir=self.config.browser.profile_dir)
             logger.success("NopeCHA extension installed")
         
-        # Initialize email service
-        self.email_service = EmailService(self.config.email)
+        # Initialize email service (parallel signups open one per task)
+        if not self._parallel:
+            self.email_service = EmailService(self.config.email)
+        
+        # Signup birthday (19 years ago today), formatted once per run
+        now = datetime.now()
+        self._month, self._day, self._year_adult = now.strftime("%b"), f"{now.day:02d}", str(now.year - 19)
+        
+        # Accounts are appended to accounts.jsonl as soon as they are created
+        if "jsonl" in self.config.export_formats:
+            self._jsonl = open("accounts.jsonl", "ab")
         
         logger.success("All services initialized")
     
+    # Candidates validated concurrently per round, and rounds before giving up
+    USERNAME_BATCH = 16
+    USERNAME_ROUNDS = 6
+    
     async def generate_username(self) -> str:
         """Generate and validate username"""
+        batch_size = self.USERNAME_BATCH
+        
         if self.config.username_format:
-            # Use prefix format
-            counter = 0
-            while counter < 100:
-                username = f"{self.config.username_format}_{counter}"
-                is_valid = await self.roblox_api.validate_username(username)
-                if is_valid:
-                    return username
-                counter += 1
+            # Use prefix format, checking a window of counters at a time
+            prefix = self.config.username_format
+            for start in range(0, 100, batch_size):
+                batch = [f"{prefix}_{i}" for i in range(start, min(start + batch_size, 100))]
+                results = await self.roblox_api.validate_usernames(batch)
+                for username, is_valid in zip(batch, results):
+                    if is_valid:
+                        return username
             
             # Fallback to scrambled if all taken
-            logger.warning(f"All usernames with prefix '{self.config.username_format}' taken, using random")
+            logger.warning(f"All usernames with prefix '{prefix}' taken, using random")
         
         # Generate random username
-        if self.config.username_scrambled:
-            generator = UsernameGenerator()
-        else:
-            generator = StructuredUsernameGenerator()
+        generator = self.username_gen
         
-        for _ in range(100):
-            username = generator.generate()
-            is_valid = await self.roblox_api.validate_username(username)
-            if is_valid:
-                return username
+        for _ in range(self.USERNAME_ROUNDS):
+            batch = generator.generate_batch(batch_size)
+            results = await self.roblox_api.validate_usernames(batch)
+            for username, is_valid in zip(batch, results):
+                if is_valid:
+                    return username
         
-        raise Exception("Failed to generate valid username after 100 attempts")
+        raise Exception(f"Failed to generate valid username after {batch_size * self.USERNAME_ROUNDS} attempts")
     
-    async def create_account(self, index: int, total: int) -> Optional[Account]:
-        """Create a single Roblox account"""
-        progress = tqdm(total=100, desc=f"Account {index + 1}/{total}", leave=True)
-        
+    async def create_account(
+        self,
+        index: int,
+        total: int,
+        context: Optional[BrowserContext] = None,
+        email_service: Optional[EmailService] = None
+    ) -> Optional[Account]:
+        """Create a single Roblox account (in the shared context unless one is given)"""
+        email_service = email_service or self.email_service
         try:
             # Generate username
-            progress.set_description(f"Generating username [{index + 1}/{total}]")
-            progress.update(10)
+            logger.debug(f"[{index + 1}/{total}] Generating username")
             username = await self.generate_username()
             logger.info(f"Generated username: {username}")
             
             # Create email if verification enabled
             email, email_password, email_id = None, None, None
             if self.config.verification_enabled:
-                progress.set_description(f"Creating email [{index + 1}/{total}]")
-                progress.update(10)
-                email, email_password, email_id = await self.email_service.create_email(self.config.password)
+                logger.debug(f"[{index + 1}/{total}] Creating email")
+                email, email_password, email_id = await email_service.create_email(self.config.password)
                 logger.info(f"Created email: {email}")
             
             # Navigate to signup page
-            progress.set_description(f"Loading signup page [{index + 1}/{total}]")
-            progress.update(10)
+            logger.debug(f"[{index + 1}/{total}] Loading signup page")
             
-            page = await self.browser_mgr.new_page()
+            page = await context.new_page() if context else await self.browser_mgr.new_page()
             
             # Configure NopeCHA if available
             if self.captcha_solver:
@@ -127,17 +186,11 @@ class RobloxAccountCreator:
                 pass
             
             # Fill signup form
-            progress.set_description(f"Filling form [{index + 1}/{total}]")
-            progress.update(15)
-            
-            from datetime import datetime
-            current_month = datetime.now().strftime("%b")
-            current_day = datetime.now().day
-            current_year = datetime.now().year - 19
+            logger.debug(f"[{index + 1}/{total}] Filling form")
             
-            await page.select_option("#MonthDropdown", current_month)
-            await page.select_option("#DayDropdown", f"{current_day:02d}")
-            await page.select_option("#YearDropdown", str(current_year))
+            await page.select_option("#MonthDropdown", self._month)
+            await page.select_option("#DayDropdown", self._day)
+            await page.select_option("#YearDropdown", self._year_adult)
             await page.fill("#signup-username", username)
             await page.fill("#signup-password", self.config.password)
             
@@ -147,75 +200,78 @@ class RobloxAccountCreator:
             except:
                 pass
             
-            await asyncio.sleep(1)
-            
             # Submit form
-            progress.set_description(f"Submitting signup [{index + 1}/{total}]")
-            progress.update(10)
+            logger.debug(f"[{index + 1}/{total}] Submitting signup")
             
             await page.click('button[id="signup-button"]', timeout=10000)
             
             # Handle captcha if present
-            await asyncio.sleep(3)
             if self.captcha_solver:
-                progress.set_description(f"Solving captcha [{index + 1}/{total}]")
+                await self.captcha_solver.wait_for_challenge(page)
+                logger.debug(f"[{index + 1}/{total}] Solving captcha")
                 await self.captcha_solver.solve_captcha(page)
             
-            progress.update(15)
-            
             # Wait for redirect to home
             try:
                 await page.wait_for_url("**/home", timeout=30000)
             except:
                 logger.warning("Did not redirect to home page, checking current URL...")
             
-            progress.set_description(f"Account created [{index + 1}/{total}]")
-            progress.update(10)
+            logger.debug(f"[{index + 1}/{total}] Account created")
             
             # Email verification
             if self.config.verification_enabled and email:
-                progress.set_description(f"Verifying email [{index + 1}/{total}]")
+                logger.debug(f"[{index + 1}/{total}] Verifying email")
                 
                 try:
                     # Click verification modal button
                     await page.click('.btn-primary-md', timeout=5000)
-                    await asyncio.sleep(1)
                     
                     # Check if email input is present
                     email_input = page.locator('input[type="email"]')
+                    try:
+                        await email_input.first.wait_for(timeout=3000)
+                    except PWTimeout:
+                        pass
+                    
                     if await email_input.count() > 0:
                         await email_input.fill(email)
-                        await page.click('text="Add Email"', timeout=5000)
-                        await asyncio.sleep(2)
+                        clicked = False
+                        try:
+                            # Done once Roblox answers the add-email request
+                            async with page.expect_response(_is_add_email_response, timeout=5000):
+                                await page.click('text="Add Email"', timeout=5000)
+                                clicked = True
+                        except PWTimeout:
+                            if not clicked:
+                                raise  # The email was never submitted; abort verification
+                            logger.debug("No add-email API response seen after Add Email")
                         
                         # Wait for verification email
                         logger.info("Waiting for verification email...")
-                        verification_link = await self.email_service.wait_for_verification_email()
+                        verification_link = await email_service.wait_for_verification_email()
                         
                         if verification_link:
                             await page.goto(verification_link)
-                            await asyncio.sleep(3)
                             logger.success("Email verified!")
                 except Exception as e:
                     logger.warning(f"Email verification failed: {e}")
-                
-                progress.update(10)
             
             # Customize avatar
             if self.config.customization_enabled:
-                progress.set_description(f"Customizing avatar [{index + 1}/{total}]")
+                logger.debug(f"[{index + 1}/{total}] Customizing avatar")
                 await self.roblox_api.customize_avatar(page)
-                progress.update(5)
             
             # Follow users
             if self.config.following_enabled and self.config.following_usernames:
-                progress.set_description(f"Following users [{index + 1}/{total}]")
-                for follow_user in self.config.following_usernames[:3]:  # Limit to 3
+                logger.debug(f"[{index + 1}/{total}] Following users")
+                follow_users = self.config.following_usernames[:3]  # Limit to 3
+                await self.roblox_api.get_user_ids(follow_users)  # One lookup for all
+                for follow_user in follow_users:
                     await self.roblox_api.follow_user(page, follow_user)
-                progress.update(5)
             
             # Extract cookies
-            progress.set_description(f"Saving account [{index + 1}/{total}]")
+            logger.debug(f"[{index + 1}/{total}] Saving account")
             cookies = await page.context.cookies()
             cookie_list = [{"name": c["name"], "value": c["value"]} for c in cookies]
             
@@ -230,18 +286,19 @@ class RobloxAccountCreator:
                 customized=self.config.customization_enabled
             )
             
-            progress.update(max(0, 100 - progress.n))
-            progress.set_description(f"Complete [{index + 1}/{total}]")
-            progress.close()
-            
             logger.success(f"Account #{index + 1} created: {username}")
             return account
             
         except Exception as e:
             logger.error(f"Failed to create account #{index + 1}: {e}")
-            progress.close()
             return None
     
+    def _stream_account(self, account: Account) -> None:
+        """Append one account to accounts.jsonl"""
+        self._jsonl.write(_jsonl_line(account.to_dict()))
+        if len(self.accounts) % self.JSONL_FLUSH_EVERY == 0:
+            self._jsonl.flush()
+    
     async def save_accounts(self) -> None:
         """Save accounts to various formats"""
         if not self.accounts:
@@ -249,59 +306,101 @@ class RobloxAccountCreator:
             return
         
         logger.info("Saving accounts...")
+        formats = self.config.export_formats
+        sinks, saved = [], []
+        accounts_data, roblosecurity_cookies = [], []
         
-        # TXT format
-        if "txt" in self.config.export_formats:
-            with open("accounts.txt", "a", encoding="utf-8") as f:
-                for account in self.accounts:
-                    f.write(
-                        f"Username: {account.username}, "
-                        f"Password: {account.password}, "
-                        f"Email: {account.email or 'N/A'}, "
-                        f"Email Password: {account.email_password or 'N/A'} "
-                        f"(Created at {account.created_at.strftime('%Y-%m-%d %H:%M:%S')})\n"
-                    )
-            logger.success("Saved to accounts.txt")
-        
-        # JSON format
-        if "json" in self.config.export_formats:
-            import json
-            accounts_data = [account.to_dict() for account in self.accounts]
-            with open("accounts.json", "w", encoding="utf-8") as f:
-                json.dump(accounts_data, f, indent=2, default=str)
-            logger.success("Saved to accounts.json")
-        
-        # CSV format
-        if "csv" in self.config.export_formats:
-            import csv
-            with open("accounts.csv", "w", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
+        with contextlib.ExitStack() as stack:
+            # TXT format
+            if "txt" in formats:
+                txt_file = stack.enter_context(open("accounts.txt", "a", encoding="utf-8"))
+                sinks.append(lambda account, cookie: txt_file.write(
+                    f"Username: {account.username}, "
+                    f"Password: {account.password}, "
+                    f"Email: {account.email or 'N/A'}, "
+                    f"Email Password: {account.email_password or 'N/A'} "
+                    f"(Created at {account.created_at.strftime('%Y-%m-%d %H:%M:%S')})\n"
+                ))
+                saved.append("accounts.txt")
+            
+            # JSON format (dumped once the list is complete)
+            if "json" in formats:
+                sinks.append(lambda account, cookie: accounts_data.append(account.to_dict()))
+            
+            # CSV format
+            if "csv" in formats:
+                csv_file = stack.enter_context(open("accounts.csv", "w", newline='', encoding="utf-8"))
+                writer = csv.writer(csv_file)
                 writer.writerow(["Username", "Password", "Email", "Email Password", "ROBLOSECURITY", "Created At"])
-                for account in self.accounts:
-                    writer.writerow([
-                        account.username,
-                        account.password,
-                        account.email or "N/A",
-                        account.email_password or "N/A",
-                        account.get_roblosecurity() or "N/A",
-                        account.created_at.isoformat()
-                    ])
-            logger.success("Saved to accounts.csv")
-        
-        # Roblox Account Manager format
-        if self.config.roblox_account_manager:
-            import pyperclip
-            roblosecurity_cookies = []
+                sinks.append(lambda account, cookie: writer.writerow([
+                    account.username,
+                    account.password,
+                    account.email or "N/A",
+                    account.email_password or "N/A",
+                    cookie or "N/A",
+                    account.created_at.isoformat()
+                ]))
+                saved.append("accounts.csv")
+            
+            # Roblox Account Manager format
+            if self.config.roblox_account_manager:
+                def collect_cookie(account, cookie):
+                    if cookie:
+                        roblosecurity_cookies.append(cookie)
+                sinks.append(collect_cookie)
+            
+            # Single pass: every sink sees each account once
             for account in self.accounts:
                 cookie = account.get_roblosecurity()
-                if cookie:
-                    roblosecurity_cookies.append(cookie)
-            
-            if roblosecurity_cookies:
-                cookies_text = "\n".join(roblosecurity_cookies)
-                pyperclip.copy(cookies_text)
-                logger.success("ROBLOSECURITY cookies copied to clipboard!")
-                print("\n✅ Paste these cookies into Roblox Account Manager (Cookie import mode)")
+                for sink in sinks:
+                    sink(account, cookie)
+            
+            if "json" in formats:
+                with open("accounts.json", "w", encoding="utf-8") as f:
+                    json.dump(accounts_data, f, indent=2, default=str)
+                saved.append("accounts.json")
+        
+        for filename in saved:
+            logger.success(f"Saved to {filename}")
+        
+        if roblosecurity_cookies and pyperclip is None:
+            logger.warning("pyperclip not installed, ROBLOSECURITY cookies were not copied")
+        elif roblosecurity_cookies:
+            cookies_text = "\n".join(roblosecurity_cookies)
+            pyperclip.copy(cookies_text)
+            logger.success("ROBLOSECURITY cookies copied to clipboard!")
+            print("\n✅ Paste these cookies into Roblox Account Manager (Cookie import mode)")
+    
+    def _record_account(self, account: Optional[Account]) -> None:
+        """Keep a finished account and stream it if jsonl export is on"""
+        if account:
+            self.accounts.append(account)
+            if self._jsonl:
+                self._stream_account(account)
+    
+    async def _run_parallel(self, progress: tqdm) -> None:
+        """Create accounts concurrently, each in its own context and mailbox"""
+        concurrency = max(1, self.config.max_parallel)
+        total = self.config.count
+        
+        async def one(index: int) -> None:
+            try:
+                # Stagger starts so the configured delay still spreads signups out
+                await asyncio.sleep(index * self.config.rate_limit_delay / concurrency)
+                async with self.browser_pool.acquire() as context:
+                    async with EmailService(self.config.email) as email_service:
+                        account = await self.create_account(index, total, context, email_service)
+                self._record_account(account)
+            finally:
+                progress.update(1)
+        
+        logger.info(f"Running up to {concurrency} signups in parallel")
+        results = await asyncio.gather(*(one(i) for i in range(total)), return_exceptions=True)
+        
+        # Let every signup finish before run() closes the browser, then report failures
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to create account #{index + 1}: {result}")
     
     async def run(self) -> None:
         """Main execution loop"""
@@ -309,16 +408,26 @@ class RobloxAccountCreator:
             await self.initialize()
             
             logger.info(f"Creating {self.config.count} account(s)...")
+            # Closed even if a signup raises, so the traceback isn't drawn under the bar
+            with tqdm(total=self.config.count, desc="Accounts") as progress:
+                if self._parallel:
+                    await self._run_parallel(progress)
+                else:
+                    for i in range(self.config.count):
+                        # Fresh cookies/storage per account without relaunching the browser
+                        if i > 0:
+                            await self.browser_mgr.swap_identity()
+                        
+                        account = await self.create_account(i, self.config.count)
+                        progress.update(1)
+                        self._record_account(account)
+                        
+                        # Rate limiting between accounts
+                        if i < self.config.count - 1:
+                            await asyncio.sleep(self.config.rate_limit_delay)
             
-            for i in range(self.config.count):
-                account = await self.create_account(i, self.config.count)
-                
-                if account:
-                    self.accounts.append(account)
-                
-                # Rate limiting between accounts
-                if i < self.config.count - 1:
-                    await asyncio.sleep(self.config.rate_limit_delay)
+            if self._jsonl:
+                logger.success("Saved to accounts.jsonl")
             
             # Save all accounts
             await self.save_accounts()
@@ -331,8 +440,14 @@ class RobloxAccountCreator:
             # Cleanup
             if self.browser_mgr:
                 await self.browser_mgr.close()
+            if self.browser_pool:
+                await self.browser_pool.close()
             if self.roblox_api:
                 await self.roblox_api.close()
+            if self.email_service:
+                await self.email_service.close()
+            if self._jsonl:
+                self._jsonl.close()
 
 
 async def main():
@@ -354,7 +469,7 @@ async def main():
         creator = RobloxAccountCreator(config)
         await creator.run()
         
-        logger.success("\nAll done! Check accounts.txt, accounts.json, and accounts.csv")
+        logger.success("\nAll done! Check accounts.txt, accounts.jsonl, and accounts.csv")
         
     except KeyboardInterrupt:
         logger.warning("\n\nInterrupted by user")
@@ -5,7 +5,7 @@ import asyncio
 import sys
 from pathlib import Path
 
-async def test_imports():
+def test_imports():
     """Test that all modules import correctly"""
     print("Testing imports...")
     
@@ -41,7 +41,7 @@ async def test_imports():
         print(f"\n❌ Import failed: {e}\n")
         return False
 
-async def test_config():
+def test_config():
     """Test config loading"""
     print("Testing configuration...")
     
@@ -66,7 +66,7 @@ async def test_config():
         print(f"\n❌ Config test failed: {e}\n")
         return False
 
-async def test_username_generation():
+def test_username_generation():
     """Test username generation"""
     print("Testing username generation...")
     
@@ -116,24 +116,23 @@ async def test_roblox_api():
         print(f"\n❌ Roblox API test failed: {e}\n")
         return False
 
-async def main():
+def main():
     """Run all tests"""
     print("=" * 60)
     print("Roblox Auto-Signup - Installation Test (2026)")
     print("=" * 60)
     print()
     
-    tests = [
+    # Only the API check awaits anything; the rest run before any event loop
+    results = [
         test_imports(),
         test_config(),
         test_username_generation(),
-        test_roblox_api(),
+        asyncio.run(test_roblox_api()),
     ]
     
-    results = await asyncio.gather(*tests, return_exceptions=True)
-    
     passed = sum(1 for r in results if r is True)
-    total = len(tests)
+    total = len(results)
     
     print("=" * 60)
     if passed == total:
@@ -149,7 +148,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
         print("\n\nTest interrupted")
     except Exception as e: